@@ -1,10 +1,11 @@
 import hashlib
 import json
-from collections.abc import Generator
+import os
+import threading
+from collections.abc import Callable, Collection
 from pathlib import Path
 
 import attr
-import cattrs
 from httpx import Response
 
 from kamuidrome.modrinth.models import ProjectId, VersionId
@@ -22,6 +23,22 @@ class ModVersionMetadata:
     #: The blake2b hash for this mod version.
     blake_hexdigest: str = attr.ib()
 
+    # this is a two field class, so going through cattrs for it is a lot of overhead for no gain.
+    @classmethod
+    def from_dict(cls, raw: dict[str, str]) -> "ModVersionMetadata":
+        """
+        Creates a new :class:`.ModVersionMetadata` from its serialised form.
+        """
+
+        return cls(real_file_name=raw["real_file_name"], blake_hexdigest=raw["blake_hexdigest"])
+
+    def to_dict(self) -> dict[str, str]:
+        """
+        Converts this metadata into its serialised form.
+        """
+
+        return {"real_file_name": self.real_file_name, "blake_hexdigest": self.blake_hexdigest}
+
 
 class ModCache:
     """
@@ -29,10 +46,38 @@ class ModCache:
     """
 
     def __init__(self, cache_dir: Path) -> None:
-        self.path = cache_dir
+        # resolved up front, so that every path handed out is already a real path. deploying
+        # symlinks to every single mod, and resolving each of those separately adds up.
+        self.path = cache_dir.resolve()
+        # parsed ``metadata.json`` files, keyed by project. bulk operations hit the same project
+        # over and over, so there's no point re-reading it from disk every time.
+        self._meta_cache: dict[ProjectId, dict[str, ModVersionMetadata]] = {}
+        # projects whose metadata has been changed in memory but not written out yet.
+        self._dirty: set[ProjectId] = set()
+        # per-project directories, and which of those we know exist on disk.
+        self._project_dirs: dict[ProjectId, Path] = {}
+        self._created_dirs: set[ProjectId] = set()
+        # mods can be downloaded from several threads at once.
+        self._lock = threading.Lock()
 
         self.path.mkdir(exist_ok=True)
 
+    def _project_dir(self, id: ProjectId, create: bool = False) -> Path:
+        """
+        Gets the cache directory for a single project, optionally creating it.
+        """
+
+        try:
+            path = self._project_dirs[id]
+        except KeyError:
+            path = self._project_dirs[id] = self.path / id
+
+        if create and id not in self._created_dirs:
+            path.mkdir(exist_ok=True)
+            self._created_dirs.add(id)
+
+        return path
+
     def get_mod_path(self, id: ProjectId, version_id: VersionId) -> Path:
         """
         Gets the path to a mod ``.jar`` file.
@@ -40,15 +85,24 @@ class ModCache:
         This path may or may not exist.
         """
 
-        return (self.path / id / version_id).with_suffix(".jar")
+        return self._project_dir(id) / f"{version_id}.jar"
 
     def _get_metadata(self, id: ProjectId) -> dict[str, ModVersionMetadata]:
-        path = self.path / id / "metadata.json"
         try:
-            content = cattrs.structure(json.loads(path.read_text()), dict[str, ModVersionMetadata])
+            return self._meta_cache[id]
+        except KeyError:
+            pass
+
+        path = self._project_dir(id) / "metadata.json"
+        content: dict[str, ModVersionMetadata]
+        try:
+            raw: dict[str, dict[str, str]] = json.loads(path.read_bytes())
         except FileNotFoundError:
             content = {}
+        else:
+            content = {k: ModVersionMetadata.from_dict(v) for k, v in raw.items()}
 
+        self._meta_cache[id] = content
         return content
 
     def get_real_filename(self, id: ProjectId, version_id: VersionId) -> str | None:
@@ -70,12 +124,37 @@ class ModCache:
     ) -> None:
         """
         Updates the metadata for a single mod version file.
+
+        This is only written to disk on the next :meth:`.flush`.
+        """
+
+        with self._lock:
+            content = self._get_metadata(project_id)
+            content[version_id] = ModVersionMetadata(real_file_name=filename, blake_hexdigest=hash)
+            self._meta_cache[project_id] = content
+            self._dirty.add(project_id)
+
+    def flush(self) -> None:
+        """
+        Writes out the metadata for every project that has changed since the last flush.
         """
 
-        content = self._get_metadata(project_id)
-        content[version_id] = ModVersionMetadata(real_file_name=filename, blake_hexdigest=hash)
-        with (self.path / project_id / "metadata.json").open(mode="w") as f:
-            json.dump(cattrs.unstructure(content), f)
+        for project_id in self._dirty:
+            project_dir = self._project_dir(project_id, create=True)
+            content = {k: v.to_dict() for k, v in self._meta_cache[project_id].items()}
+
+            # write-then-rename so that getting interrupted halfway through doesn't leave a
+            # truncated metadata file behind, same as the pack's mod index. (``dumps``, not
+            # ``dump``, as only that uses the C encoder.)
+            temp_metadata = project_dir / ".metadata.json.tmp"
+            try:
+                temp_metadata.write_bytes(json.dumps(content).encode("utf-8"))
+                os.replace(temp_metadata, project_dir / "metadata.json")
+            except BaseException:
+                temp_metadata.unlink(missing_ok=True)
+                raise
+
+        self._dirty.clear()
 
     def get_file_checksum(self, project_id: ProjectId, version_id: VersionId) -> str | None:
         """
@@ -93,20 +172,116 @@ class ModCache:
         project_id: ProjectId,
         version_id: VersionId,
         real_file_name: str,
-    ) -> Generator[int, None, None]:
+        progress: Callable[[int], None] | None = None,
+    ) -> None:
         """
         Downloads a single mod from the provided :class:`.Response`.
+
+        If ``progress`` is provided, it is called with the size of each chunk as it is written.
         """
 
-        mod_path = self.get_mod_path(project_id, version_id)
-        mod_path.parent.mkdir(exist_ok=True)
+        mod_path = self._project_dir(project_id, create=True) / f"{version_id}.jar"
 
-        summer = hashlib.blake2b()
+        # blake3 would be faster, but these checksums end up in every pack's ``mod-index.json``
+        # and are compared against freshly downloaded files. changing the algorithm would make
+        # every existing pack fail validation the next time the cache gets cleared, so we're
+        # stuck with blake2b. for the same reason the digest size stays at the default 64 bytes.
+        # these are only integrity checks, so there's no need for any FIPS gatekeeping either.
+        summer = hashlib.blake2b(usedforsecurity=False)
 
         with mod_path.open(mode="wb") as f:
-            for chunk in response.iter_bytes(16 * 1024):  # 16KiB chunks seems reasonable
+            # no chunk size here on purpose; asking httpx for fixed-size chunks makes it copy
+            # everything through an intermediate buffer. the chunks it reads off the socket are
+            # already big enough.
+            for chunk in response.iter_bytes():
                 summer.update(chunk)
                 f.write(chunk)
-                yield len(chunk)
+
+                if progress is not None:
+                    progress(len(chunk))
 
         self._update_metadata(project_id, version_id, real_file_name, summer.hexdigest())
+
+    def prune(
+        self,
+        max_bytes: int,
+        keep: Collection[tuple[ProjectId, VersionId]],
+    ) -> tuple[list[tuple[ProjectId, VersionId, int]], int]:
+        """
+        Deletes the least recently used mod jars and HTTP cache entries until the cache is no larger
+        than ``max_bytes``.
+
+        Versions in ``keep`` are never deleted, even if that means staying over the limit. Returns
+        the ``(project, version, size)`` of every deleted jar, and the total size of every deleted
+        HTTP cache entry.
+        """
+
+        # (last used, size, path, (project, version) or None for http cache entries)
+        entries: list[tuple[float, int, str, tuple[ProjectId, VersionId] | None]] = []
+
+        def last_used(st: os.stat_result) -> float:
+            # lots of filesystems are mounted ``relatime`` or ``noatime``, so the access time can be
+            # older than when the file was written.
+            return max(st.st_atime, st.st_mtime)
+
+        with os.scandir(self.path) as projects:
+            for project in projects:
+                if not project.is_dir(follow_symlinks=False):
+                    continue
+
+                with os.scandir(project.path) as files:
+                    # the http cache lives in here too. it only has responses in it, which can
+                    # always just be fetched again.
+                    if project.name == "http":
+                        for file in files:
+                            if file.is_file(follow_symlinks=False):
+                                st = file.stat()
+                                entries.append((last_used(st), st.st_size, file.path, None))
+
+                        continue
+
+                    for file in files:
+                        if not file.name.endswith(".jar"):
+                            continue
+
+                        st = file.stat()
+                        entries.append(
+                            (
+                                last_used(st),
+                                st.st_size,
+                                file.path,
+                                (
+                                    ProjectId(project.name),
+                                    VersionId(file.name.removesuffix(".jar")),
+                                ),
+                            )
+                        )
+
+        total = sum(size for _, size, _, _ in entries)
+        removed: list[tuple[ProjectId, VersionId, int]] = []
+        http_removed = 0
+
+        for _, size, path, ids in sorted(entries):
+            if total <= max_bytes:
+                break
+
+            if ids is None:
+                Path(path).unlink(missing_ok=True)
+                total -= size
+                http_removed += size
+                continue
+
+            if ids in keep:
+                continue
+
+            project_id, version_id = ids
+            self.get_mod_path(project_id, version_id).unlink(missing_ok=True)
+            total -= size
+            removed.append((project_id, version_id, size))
+
+            with self._lock:
+                if self._get_metadata(project_id).pop(version_id, None) is not None:
+                    self._dirty.add(project_id)
+
+        self.flush()
+        return removed, http_removed
@@ -4,29 +4,15 @@ import pprint
 import sys
 from pathlib import Path
 
-import cattrs
-import httpx
 import platformdirs
-import tomlkit
-from rich import print
 
-from kamuidrome.cache import ModCache
-from kamuidrome.cli.add import add_mod_by_project_id, add_mod_by_searching, add_mod_by_version_id
-from kamuidrome.cli.init import interactively_create_pack
-from kamuidrome.cli.list import list_indexed_mods
-from kamuidrome.cli.update import download_all_mods, update_all_mods
-from kamuidrome.meta import LocalMetadata
-from kamuidrome.modrinth.client import ModrinthApi
-from kamuidrome.modrinth.models import ProjectId, VersionId
-from kamuidrome.modrinth.mrpack import create_mrpack
-from kamuidrome.pack import find_pack_dir, load_local_pack
+# the subcommand implementations are imported inside their branches in ``main``, so that e.g.
+# ``kamuidrome list`` doesn't have to pay for importing the mrpack exporter. likewise, everything
+# else heavy (httpx, rich, the pack loading) is only imported once the arguments are parsed, so
+# that ``--help`` or a typo'd argument doesn't have to sit through importing all of it first.
 
 
-def main() -> int:
-    """
-    Main entrypoint.
-    """
-
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--pack-dir",
@@ -40,6 +26,13 @@ def main() -> int:
         default=Path(platformdirs.user_cache_dir("kamuidrone")),
         type=Path,
     )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help="Show every rejected mod version when resolving versions",
+        action="store_true",
+        default=False,
+    )
 
     subcommands = parser.add_subparsers(
         title="Subcommands",
@@ -88,6 +81,11 @@ def main() -> int:
     subcommands.add_parser(name="download", help="Downloads all mods in the index")
     subcommands.add_parser(name="update", help="Updates all mods and dependenciess in the index")
 
+    prune_group = subcommands.add_parser(
+        name="prune", help="Removes the least recently used mods from the mod cache"
+    )
+    prune_group.add_argument("MAX_SIZE", type=int, help="The size to shrink the cache to, in MiB")
+
     export_group = subcommands.add_parser("export", help="Exports pack as an mrpack file")
     export_group.add_argument(
         "FILENAME", help="The name of the file or directory to write", nargs="?", default=None
@@ -102,14 +100,35 @@ def main() -> int:
         "--server-only", action="store_true", default=False, help="Only outputs server-side mods"
     )
 
+    return parser
+
+
+def main() -> int:
+    """
+    Main entrypoint.
+    """
+
+    parser = _build_parser()
     args = parser.parse_args()
+
+    import httpx
+    from rich import print
+
+    from kamuidrome.cache import ModCache
+    from kamuidrome.httpcache import RevalidatingCacheTransport
+    from kamuidrome.modrinth.client import CONNECTION_LIMITS, ModrinthApi
+    from kamuidrome.pack import find_pack_dir, load_local_pack
+
     cache_dir: Path = args.cache_dir
     cache = ModCache(cache_dir=cache_dir)
 
     subcommand: str = args.subcommand
+    verbose: bool = args.verbose
 
     pack_dir: Path | None = args.pack_dir
     if subcommand == "init":
+        from kamuidrome.cli.init import interactively_create_pack
+
         if pack_dir is None:
             pack_dir = Path.cwd()
 
@@ -124,22 +143,44 @@ def main() -> int:
 
     pack = load_local_pack(pack_dir)
 
-    with httpx.Client() as client:
+    # the pool limits have to go on the transport, as ``httpx.Client`` ignores its own ``limits``
+    # when it's given a transport.
+    http_transport = RevalidatingCacheTransport(
+        httpx.HTTPTransport(limits=CONNECTION_LIMITS), cache_dir / "http"
+    )
+    with ModrinthApi.make_client(http_transport) as client:
         api = ModrinthApi(client)
 
         if subcommand == "add":
+            from kamuidrome.cli.add import (
+                add_mod_by_project_id,
+                add_mod_by_searching,
+                add_mod_by_version_id,
+            )
+            from kamuidrome.modrinth.models import ProjectId, VersionId
+
             search_query: str | None = args.search
             if search_query is not None:
-                return add_mod_by_searching(pack, api, cache, search_query, args.always_select)
+                return add_mod_by_searching(
+                    pack, api, cache, search_query, args.always_select, verbose=verbose
+                )
 
             project_id: str | None = args.project_id
             if project_id is not None:
-                return add_mod_by_project_id(pack, api, cache, ProjectId(project_id))
+                return add_mod_by_project_id(
+                    pack, api, cache, ProjectId(project_id), verbose=verbose
+                )
 
             version_id: str = args.version_id
-            add_mod_by_version_id(pack, api, cache, VersionId(version_id))
+            add_mod_by_version_id(pack, api, cache, VersionId(version_id), verbose=verbose)
 
         elif subcommand == "deploy":
+            import tomllib
+
+            import cattrs
+
+            from kamuidrome.meta import LocalMetadata
+
             instance_name: str | None = args.instance
             folder_name: Path | None = args.directory
 
@@ -147,7 +188,7 @@ def main() -> int:
 
             with contextlib.suppress(FileNotFoundError, KeyError):
                 localpack = pack.directory / "localpack.toml"
-                data = tomlkit.loads(localpack.read_text())
+                data = tomllib.loads(localpack.read_text())
                 local_metadata = cattrs.structure(data, LocalMetadata)
 
             if folder_name is not None:
@@ -168,15 +209,28 @@ def main() -> int:
             return pack.pin(" ".join(args.MOD))
 
         elif subcommand == "download":
+            from kamuidrome.cli.update import download_all_mods
+
             return download_all_mods(pack, api, cache)
 
         elif subcommand == "update":
-            return update_all_mods(pack, api, cache)
+            from kamuidrome.cli.update import update_all_mods
+
+            return update_all_mods(pack, api, cache, verbose=verbose)
+
+        elif subcommand == "prune":
+            from kamuidrome.cli.prune import prune_cache
+
+            return prune_cache(pack, cache, args.MAX_SIZE)
 
         elif subcommand == "list":
+            from kamuidrome.cli.list import list_indexed_mods
+
             return list_indexed_mods(pack)
 
         elif subcommand == "export":
+            from kamuidrome.modrinth.mrpack import create_mrpack
+
             export_name: str | None = args.FILENAME
             ci_mode: bool = args.ci_mode
             server_only: bool = args.server_only
@@ -203,7 +257,13 @@ if __name__ == "__main__":
     def _run():
         try:
             sys.exit(main())
-        except httpx.HTTPStatusError as e:
+        except Exception as e:
+            # httpx is only imported inside ``main``.
+            import httpx
+
+            if not isinstance(e, httpx.HTTPStatusError):
+                raise
+
             pprint.pprint(e.response.json())
 
     _run()
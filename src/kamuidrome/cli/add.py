@@ -13,12 +13,31 @@ from kamuidrome.modrinth.utils import (
 )
 from kamuidrome.pack import LocalPack
 
+#: How similar a search result's title has to be to the search query for it to be picked without
+#: asking, as the Jaccard index of their character bigrams.
+AUTO_MATCH_SIMILARITY = 0.7
+
+
+def _bigrams(value: str) -> set[str]:
+    # punctuation and spacing are all over the place in mod names (``fabric-api`` vs. Fabric API),
+    # so only the letters and numbers count.
+    normalised = "".join(c for c in value.lower() if c.isalnum())
+    return {normalised[i : i + 2] for i in range(len(normalised) - 1)}
+
+
+def _similarity(query: set[str], title: set[str]) -> float:
+    if not query or not title:
+        return 0.0
+
+    return len(query & title) / len(query | title)
+
 
 def _common_from_project_id(
     pack: LocalPack,
     client: ModrinthApi,
     cache: ModCache,
     project_id: ProjectId | ProjectInfoMixin,
+    verbose: bool = False,
 ) -> int:
     """
     Common code for any path that uses a project ID.
@@ -37,10 +56,10 @@ def _common_from_project_id(
         print("[red]error:[/red] cowardly refusing to install Fabric API on a forge instance")
         return 1
 
-    version = resolve_latest_version(pack.metadata, client, project_info)
+    version = resolve_latest_version(pack.metadata, client, project_info, verbose=verbose)
     all_versions = [
         (project_info, version),
-        *resolve_dependency_versions(pack.metadata, client, version),
+        *resolve_dependency_versions(pack.metadata, client, version, verbose=verbose),
     ]
     pack.download_and_add_mods(client, cache, all_versions, selected_mod=project_info.id)
 
@@ -53,6 +72,7 @@ def add_mod_by_searching(
     cache: ModCache,
     query: str,
     always_prompt_selection: bool,
+    verbose: bool = False,
 ) -> int:
     """
     Adds a new mod by searching Modrinth.
@@ -86,7 +106,18 @@ def add_mod_by_searching(
         should_auto_match = True
 
     else:
-        should_auto_match = False
+        # not an exact match, but if exactly one of the results is close enough to what was asked
+        # for then that's probably it. if there's more than one then it's anyone's guess.
+        query_bigrams = _bigrams(query)
+        close = [
+            option
+            for option in result
+            if _similarity(query_bigrams, _bigrams(option.title)) >= AUTO_MATCH_SIMILARITY
+        ]
+
+        should_auto_match = len(close) == 1
+        if should_auto_match:
+            matched = close[0]
 
     if not should_auto_match:
         print("[yellow]No exact match found[/yellow], listing possible options")
@@ -102,11 +133,15 @@ def add_mod_by_searching(
     else:
         print(f"[green]successful match[/green]: {matched.title} / {matched.id}")
 
-    return _common_from_project_id(pack, client, cache, matched.id)
+    return _common_from_project_id(pack, client, cache, matched.id, verbose=verbose)
 
 
 def add_mod_by_project_id(
-    pack: LocalPack, client: ModrinthApi, cache: ModCache, project_id: ProjectId
+    pack: LocalPack,
+    client: ModrinthApi,
+    cache: ModCache,
+    project_id: ProjectId,
+    verbose: bool = False,
 ) -> int:
     """
     Adds a new mod by project ID.
@@ -121,11 +156,15 @@ def add_mod_by_project_id(
 
         raise
 
-    return _common_from_project_id(pack, client, cache, result)
+    return _common_from_project_id(pack, client, cache, result, verbose=verbose)
 
 
 def add_mod_by_version_id(
-    pack: LocalPack, client: ModrinthApi, cache: ModCache, version_id: VersionId
+    pack: LocalPack,
+    client: ModrinthApi,
+    cache: ModCache,
+    version_id: VersionId,
+    verbose: bool = False,
 ):
     """
     Adds a new mod by an explicit version ID.
@@ -158,7 +197,7 @@ def add_mod_by_version_id(
 
     all_versions = [
         (project_info, found_version),
-        *resolve_dependency_versions(pack.metadata, client, found_version),
+        *resolve_dependency_versions(pack.metadata, client, found_version, verbose=verbose),
     ]
     pack.download_and_add_mods(client, cache, all_versions, selected_mod=project_info.id)
 
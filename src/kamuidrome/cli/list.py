@@ -6,19 +6,21 @@ from rich.text import Text
 
 from kamuidrome.pack import InstalledMod, LocalPack
 
+# the pinned column only ever has two values, so there's no need to build new ones for every row.
+_PINNED = Text("Yes", justify="right", style="green")
+_NOT_PINNED = Text("No", justify="right", style="yellow")
+
 
 def _apply_table(table: Table, mods: Iterable[InstalledMod]) -> None:
-    table.add_column("Name", justify="left")
+    table.add_column("Name", justify="left", style="magenta")
     table.add_column("Version", justify="center")
     table.add_column("Pinned", justify="right")
 
     for mod in mods:
-        pinned = "No" if not mod.pinned else "Yes"
-        pinned_style = "yellow" if not mod.pinned else "green"
         table.add_row(
-            Text(mod.name, style="magenta", justify="left"),
+            Text(mod.name),  # not markup, mod names can have square brackets in them
             mod.version,
-            Text(pinned, justify="right", style=pinned_style),
+            _PINNED if mod.pinned else _NOT_PINNED,
         )
 
     print(table)
@@ -29,8 +31,12 @@ def list_indexed_mods(pack: LocalPack, include_deps: bool = True) -> int:
     Lists the indexed mods for the current pack.
     """
 
+    selected: list[InstalledMod] = []
+    dependencies: list[InstalledMod] = []
+    for mod in pack.mods.values():
+        (selected if mod.selected else dependencies).append(mod)
+
     if include_deps:
-        dependencies = [mod for mod in pack.mods.values() if not mod.selected]
         dep_table = Table(
             title="[italic]Dependency mods[/italic] (not explicitly selected)",
             box=box.SIMPLE,
@@ -39,7 +45,6 @@ def list_indexed_mods(pack: LocalPack, include_deps: bool = True) -> int:
         _apply_table(dep_table, dependencies)
         print()
 
-    selected = [mod for mod in pack.mods.values() if mod.selected]
     selected_table = Table(title="Selected mods", box=box.SIMPLE, min_width=50)
     _apply_table(selected_table, selected)
 
@@ -0,0 +1,33 @@
+from rich import print
+
+from kamuidrome.cache import ModCache
+from kamuidrome.pack import LocalPack
+
+
+def prune_cache(pack: LocalPack, cache: ModCache, max_size_mib: int) -> int:
+    """
+    Removes the least recently used mods (and cached API responses) from the cache until it fits
+    in the provided size.
+
+    Mods used by the current pack are always kept.
+    """
+
+    # the cache is shared between every pack, and deployed instances symlink straight into it,
+    # which is why this isn't done automatically; anything removed here that another pack still
+    # uses will need a ``kamuidrome download`` in that pack before it can be deployed again.
+    keep = {(mod.project_id, mod.version_id) for mod in pack.mods.values()}
+    removed, http_removed = cache.prune(max_size_mib * 1024 * 1024, keep)
+
+    for project_id, version_id, size in removed:
+        print(
+            f"[yellow]removed[/yellow] [white]{project_id}/{version_id}[/white] "
+            f"({size / (1024 * 1024):.1f} MiB)"
+        )
+
+    freed = (sum(size for _, _, size in removed) + http_removed) / (1024 * 1024)
+    print(
+        f"[green]removed {len(removed)} cached mods[/green] "
+        f"and {http_removed / (1024 * 1024):.1f} MiB of cached API responses, "
+        f"freeing {freed:.1f} MiB"
+    )
+    return 0
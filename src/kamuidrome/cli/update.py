@@ -1,8 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from rich.progress import Progress
 
 from kamuidrome.cache import ModCache
 from kamuidrome.modrinth.client import ModrinthApi
-from kamuidrome.modrinth.models import ProjectId
+from kamuidrome.modrinth.models import (
+    ProjectId,
+    ProjectInfoFromProject,
+    ProjectInfoMixin,
+    ProjectVersion,
+)
 from kamuidrome.modrinth.utils import (
     VersionResult,
     resolve_dependency_versions,
@@ -10,6 +17,9 @@ from kamuidrome.modrinth.utils import (
 )
 from kamuidrome.pack import LocalPack
 
+#: The maximum number of mods to resolve the latest versions for at once.
+MAX_CONCURRENT_RESOLUTIONS = 16
+
 
 def download_all_mods(
     pack: LocalPack,
@@ -20,12 +30,17 @@ def download_all_mods(
     Downloads all mods in the index for a specified pack.
     """
 
-    projects = {p.id: p for p in modrinth.get_multiple_projects(list(pack.mods.keys()))}
-    versions = modrinth.get_multiple_versions([v.version_id for v in pack.mods.values()])
-    all_versions: VersionResult = []
+    # these two don't depend on each other, so there's no need to wait for one before the other.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        projects_future = pool.submit(modrinth.get_multiple_projects, list(pack.mods.keys()))
+        versions_future = pool.submit(
+            modrinth.get_multiple_versions, [v.version_id for v in pack.mods.values()]
+        )
+
+        projects = {p.id: p for p in projects_future.result()}
+        versions = versions_future.result()
 
-    for ver in versions:
-        all_versions.append((projects[ver.project_id], ver))
+    all_versions: VersionResult = [(projects[ver.project_id], ver) for ver in versions]
 
     pack.download_and_add_mods(modrinth, cache, all_versions, selected_mod=None)
 
@@ -36,38 +51,44 @@ def update_all_mods(
     pack: LocalPack,
     modrinth: ModrinthApi,
     cache: ModCache,
+    verbose: bool = False,
 ) -> int:
     """
     Updates all mods in the index for a specified pack.
     """
 
-    all_versions: VersionResult = []
-    deps_seen: set[ProjectId] = set()
-
     with Progress() as progress:
         task = progress.add_task("Fetching mod info", total=len(pack.mods))
 
         projects = modrinth.get_multiple_projects(list(pack.mods.keys()))
 
-        for mod in projects:
-            latest_version = resolve_latest_version(pack.metadata, modrinth, mod)
-            all_versions.append((mod, latest_version))
-            all_versions += resolve_dependency_versions(
-                pack.metadata, modrinth, latest_version, _seen=deps_seen
-            )
+        def resolve_one(mod: ProjectInfoFromProject) -> ProjectVersion:
+            latest_version = resolve_latest_version(pack.metadata, modrinth, mod, verbose=verbose)
             progress.advance(task, 1)
-
-    # de-duplicate downloads
-    seen: set[ProjectId] = set()
-    to_download: VersionResult = []
-
+            return latest_version
+
+        # every mod is at least one round-trip to modrinth, so do a bunch of them at once.
+        # ``map`` keeps the results in the same order as ``projects``.
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_RESOLUTIONS) as pool:
+            latest_versions = list(pool.map(resolve_one, projects))
+
+        # the dependencies are only resolved once every top-level mod is, all in one go. that way
+        # nothing gets resolved twice because two mods share a dependency, and the top-level mods
+        # (which are the roots here) don't get resolved again as somebody else's dependency.
+        all_versions: list[tuple[ProjectInfoMixin, ProjectVersion]] = [
+            *zip(projects, latest_versions, strict=True),
+            *resolve_dependency_versions(
+                pack.metadata, modrinth, *latest_versions, verbose=verbose
+            ),
+        ]
+
+    # de-duplicate downloads. ``setdefault`` keeps the first occurrence, and dicts keep their
+    # insertion order, so this is the same order as ``all_versions``.
+    deduplicated: dict[ProjectId, tuple[ProjectInfoMixin, ProjectVersion]] = {}
     for info, version in all_versions:
-        if info.id in seen:
-            continue
-
-        seen.add(info.id)
+        deduplicated.setdefault(info.id, (info, version))
 
-        to_download.append((info, version))
+    to_download: VersionResult = list(deduplicated.values())
 
     pack.download_and_add_mods(modrinth, cache, to_download, selected_mod=None)
 
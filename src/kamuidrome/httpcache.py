@@ -0,0 +1,139 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import override
+
+import httpx
+
+#: Request extension for how long (in seconds) a cached response can be used without revalidating
+#: it first. Only for things that don't change often and where being a bit stale is fine.
+MAX_AGE_EXTENSION = "kamuidrome.max_age"
+
+
+class RevalidatingCacheTransport(httpx.BaseTransport):
+    """
+    A transport that keeps JSON responses on disk and revalidates them with conditional requests.
+
+    Cached responses are never used without asking the server first, so this only saves on
+    transferring (and generating) the body; it can never return stale data. The exception is
+    requests with the :data:`.MAX_AGE_EXTENSION` extension, which are served straight from disk
+    whilst the entry is younger than that.
+    """
+
+    # only the headers that anybody actually looks at. notably, ``content-encoding`` must not be
+    # stored because the body is saved already decoded.
+    SAVED_HEADERS = ("content-type", "etag", "last-modified")
+
+    # the subset of those that a 304 can update.
+    VALIDATOR_HEADERS = ("etag", "last-modified")
+
+    def __init__(self, wrapped_transport: httpx.BaseTransport, cache_dir: Path) -> None:
+        self.wrapped_transport = wrapped_transport
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, request: httpx.Request) -> Path:
+        return self.cache_dir / hashlib.sha256(str(request.url).encode("utf-8")).hexdigest()
+
+    def _load(self, path: Path) -> tuple[dict[str, str], bytes] | None:
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+        # first line is the saved headers, the rest is the body.
+        raw_headers, _, body = data.partition(b"\n")
+        try:
+            headers: dict[str, str] = json.loads(raw_headers)
+        except ValueError:
+            return None
+
+        return headers, body
+
+    def _save(self, path: Path, headers: dict[str, str], body: bytes) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        # same write-then-rename as the mod cache's metadata. responses get fetched from several
+        # threads at once though, so the temporary name has to be unique to this one.
+        temp_path = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        try:
+            with temp_path.open("wb") as f:
+                f.write(json.dumps(headers).encode("utf-8"))
+                f.write(b"\n")
+                f.write(body)
+
+            os.replace(temp_path, path)
+        except BaseException:
+            temp_path.unlink(missing_ok=True)
+            raise
+
+    @override
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return self.wrapped_transport.handle_request(request)
+
+        path = self._entry_path(request)
+        cached = self._load(path)
+
+        max_age: float | None = request.extensions.get(MAX_AGE_EXTENSION)
+        if cached is not None and max_age is not None:
+            try:
+                age = time.time() - path.stat().st_mtime
+            except FileNotFoundError:
+                age = max_age
+
+            if age < max_age:
+                return httpx.Response(200, headers=cached[0], content=cached[1], request=request)
+
+        if cached is not None:
+            cached_headers = cached[0]
+            if "etag" in cached_headers:
+                request.headers["if-none-match"] = cached_headers["etag"]
+            if "last-modified" in cached_headers:
+                request.headers["if-modified-since"] = cached_headers["last-modified"]
+
+        response = self.wrapped_transport.handle_request(request)
+
+        if response.status_code == 304 and cached is not None:
+            response.close()
+
+            # a 304 can come with new validators, which need keeping or the next revalidation
+            # will be against the old ones.
+            headers = cached[0] | {
+                k: response.headers[k] for k in self.VALIDATOR_HEADERS if k in response.headers
+            }
+
+            # it's just been confirmed as up to date, so it's fresh again as far as ``max_age`` is
+            # concerned. otherwise, it'd get revalidated every single time once it's expired once.
+            if headers != cached[0]:
+                self._save(path, headers, cached[1])
+            else:
+                with contextlib.suppress(FileNotFoundError):
+                    os.utime(path)
+
+            return httpx.Response(200, headers=headers, content=cached[1], request=request)
+
+        if (
+            response.status_code != 200
+            or not response.headers.get("content-type", "").startswith("application/json")
+            or (
+                "etag" not in response.headers
+                and "last-modified" not in response.headers
+                and max_age is None
+            )
+        ):
+            return response
+
+        body = response.read()
+        response.close()
+
+        headers = {k: response.headers[k] for k in self.SAVED_HEADERS if k in response.headers}
+        self._save(path, headers, body)
+        return httpx.Response(200, headers=headers, content=body, request=request)
+
+    @override
+    def close(self) -> None:
+        self.wrapped_transport.close()
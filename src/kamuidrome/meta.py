@@ -17,6 +17,47 @@ class AvailablePackLoader(enum.Enum):
     NEOFORGE = "neoforge"
 
 
+class DeployMode(enum.Enum):
+    """
+    Enumeration of the ways mod jars can be put into an instance.
+    """
+
+    SYMLINK = "symlink"
+    REFLINK = "reflink"
+    COPY = "copy"
+
+
+# there's only a handful of (loader, sinytra_compat) combinations, so just write them all down.
+_FACETS: dict[tuple[AvailablePackLoader, bool], tuple[str, ...]] = {
+    (AvailablePackLoader.FABRIC, False): ("categories:fabric",),
+    (AvailablePackLoader.FABRIC, True): ("categories:fabric",),
+    (AvailablePackLoader.QUILT, False): ("categories:quilt",),
+    (AvailablePackLoader.QUILT, True): ("categories:quilt",),
+    (AvailablePackLoader.LEGACY_FORGE, False): ("categories:forge",),
+    (AvailablePackLoader.LEGACY_FORGE, True): ("categories:fabric", "categories:forge"),
+    (AvailablePackLoader.NEOFORGE, False): ("categories:neoforge",),
+    (AvailablePackLoader.NEOFORGE, True): ("categories:fabric", "categories:neoforge"),
+}
+
+_AVAILABLE_LOADERS: dict[tuple[AvailablePackLoader, bool], tuple[str] | tuple[str, str]] = {
+    (AvailablePackLoader.FABRIC, False): ("fabric",),
+    (AvailablePackLoader.FABRIC, True): ("fabric",),
+    (AvailablePackLoader.QUILT, False): ("quilt", "fabric"),
+    (AvailablePackLoader.QUILT, True): ("quilt", "fabric"),
+    (AvailablePackLoader.LEGACY_FORGE, False): ("forge",),
+    (AvailablePackLoader.LEGACY_FORGE, True): ("forge", "fabric"),
+    (AvailablePackLoader.NEOFORGE, False): ("neoforge",),
+    (AvailablePackLoader.NEOFORGE, True): ("neoforge", "fabric"),
+}
+
+_MRPACK_NAMES: dict[AvailablePackLoader, str] = {
+    AvailablePackLoader.FABRIC: "fabric-loader",
+    AvailablePackLoader.QUILT: "quilt-loader",
+    AvailablePackLoader.LEGACY_FORGE: "forge",
+    AvailablePackLoader.NEOFORGE: "neoforge",
+}
+
+
 @attr.s(slots=True, kw_only=True)
 class PackLoaderInfo:
     """
@@ -36,44 +77,23 @@ class PackLoaderInfo:
     #: Hack to work around geckolib issues.
     prefer_fabric_geckolib: bool = attr.ib(default=True)
 
-    @property
-    def modrinth_facets(self) -> list[str]:
-        """
-        Gets a list of Modrinth facets for the loader information within.
-        """
-
-        if self.type == AvailablePackLoader.FABRIC or self.type == AvailablePackLoader.QUILT:
-            return [f"categories:{self.type.value}"]
-
-        facets: list[str] = []
-        if self.sinytra_compat:
-            facets.append("categories:fabric")
-
-        if self.type == AvailablePackLoader.LEGACY_FORGE:
-            facets.append("categories:forge")
-        else:
-            facets.append("categories:neoforge")
-
-        return facets
-
-    @property
-    def mrpack_name(self) -> str:
-        """
-        Returns the ``mrpack`` dependency name for this loader.
-        """
-
-        match self.type:
-            case AvailablePackLoader.FABRIC:
-                return "fabric-loader"
+    # these two are looked up constantly and never change, so they're worked out once up front
+    # rather than on every access.
 
-            case AvailablePackLoader.QUILT:
-                return "quilt-loader"
+    #: The Modrinth facets for the loader information within.
+    modrinth_facets: tuple[str, ...] = attr.ib(
+        init=False,
+        default=attr.Factory(
+            lambda self: _FACETS[self.type, self.sinytra_compat],
+            takes_self=True,
+        ),
+    )
 
-            case AvailablePackLoader.LEGACY_FORGE:
-                return "forge"
-
-            case AvailablePackLoader.NEOFORGE:
-                return "neoforge"
+    #: The ``mrpack`` dependency name for this loader.
+    mrpack_name: str = attr.ib(
+        init=False,
+        default=attr.Factory(lambda self: _MRPACK_NAMES[self.type], takes_self=True),
+    )
 
 
 @attr.s(slots=True, frozen=True, kw_only=True)
@@ -99,6 +119,16 @@ class PackMetadata:
 
     loader: PackLoaderInfo = attr.ib()
 
+    #: The available modloaders, in priority order. Worked out once, because it's looked up for
+    #: nearly every mod.
+    available_loaders: tuple[str] | tuple[str, str] = attr.ib(
+        init=False,
+        default=attr.Factory(
+            lambda self: _AVAILABLE_LOADERS[self.loader.type, self.loader.sinytra_compat],
+            takes_self=True,
+        ),
+    )
+
     def __attrs_post_init__(self):
         if not self.dynamic_version:
             return
@@ -111,31 +141,6 @@ class PackMetadata:
 
             object.__setattr__(self, "version", described)
 
-    @property
-    def available_loaders(self) -> tuple[str] | tuple[str, str]:
-        """
-        Returns the available modloaders, in priority order.
-        """
-
-        match self.loader.type:
-            case AvailablePackLoader.FABRIC:
-                return ("fabric",)
-
-            case AvailablePackLoader.QUILT:
-                return ("quilt", "fabric")
-
-            case AvailablePackLoader.LEGACY_FORGE if self.loader.sinytra_compat:
-                return ("forge", "fabric")
-
-            case AvailablePackLoader.LEGACY_FORGE:
-                return ("forge",)
-
-            case AvailablePackLoader.NEOFORGE if self.loader.sinytra_compat:
-                return ("neoforge", "fabric")
-
-            case AvailablePackLoader.NEOFORGE:
-                return ("neoforge",)
-
 
 @attr.s(slots=True, kw_only=True)
 class LocalMetadata:
@@ -148,3 +153,6 @@ class LocalMetadata:
 
     #: Extra directories to symlink, but not to include.
     extra_symlinked_dirs: list[str] = attr.ib(factory=list)
+
+    #: How mod jars are put into the instance. Directories are always symlinked.
+    deploy_mode: DeployMode = attr.ib(default=DeployMode.SYMLINK)
@@ -1,8 +1,10 @@
 import json
-from collections.abc import Generator, Sequence
+import threading
+from collections.abc import Callable, Generator, Sequence
 from contextlib import contextmanager
+from datetime import datetime
 from importlib import metadata
-from typing import Literal
+from typing import Any, Literal
 
 import arrow
 import cattr
@@ -18,14 +20,51 @@ from kamuidrome.modrinth.models import (
 )
 from kamuidrome.retry import RetryTransport
 
-CONVERTER = cattr.GenConverter()
-CONVERTER.forbid_extra_keys = False
-CONVERTER.register_structure_hook(arrow.Arrow, lambda it, _: arrow.get(it))
+CONVERTER = cattr.GenConverter(forbid_extra_keys=False)
+
+
+def _structure_arrow(value: str, _: type[arrow.Arrow]) -> arrow.Arrow:
+    # ``arrow.get`` rebuilds its parser regexes on every single call, which ends up being most of
+    # the time spent structuring a list of versions. modrinth's timestamps are plain ISO 8601, which
+    # ``fromisoformat`` can deal with perfectly well.
+    try:
+        return arrow.Arrow.fromdatetime(datetime.fromisoformat(value))
+    except ValueError:
+        return arrow.get(value)
+
+
+CONVERTER.register_structure_hook(arrow.Arrow, _structure_arrow)
 
 ProjectInfoMixin.configure_converter(CONVERTER)
 ProjectVersion.configure_converter(CONVERTER)
 VERSION = metadata.version("kamuidrome")
 
+#: Connection pool limits for the transport underneath the Modrinth client.
+#:
+#: The defaults only keep idle connections around for five seconds, which means that anything
+#: waiting on the user (e.g. picking a search result) makes a fresh TLS handshake afterwards. The
+#: resolution and download pools can also have more than the default twenty keep-alive connections
+#: going at once. The total is left at the default; the nested resolution pools can briefly go well
+#: past any tight bound, and waiting for the pool counts towards the request timeout.
+CONNECTION_LIMITS = httpx.Limits(
+    max_connections=100,
+    max_keepalive_connections=32,
+    keepalive_expiry=30.0,
+)
+
+
+def _structure_hook[T](cl: type[T]) -> Callable[[Any, type[T]], T]:
+    # ``CONVERTER.structure`` re-dispatches on the type for every single call, but the hooks for
+    # the types below never change once the converter is configured.
+    return CONVERTER._structure_func.dispatch(cl)  # type: ignore
+
+
+_structure_project = _structure_hook(ProjectInfoFromProject)
+_structure_project_list = _structure_hook(list[ProjectInfoFromProject])
+_structure_version = _structure_hook(ProjectVersion)
+_structure_version_list = _structure_hook(list[ProjectVersion])
+_structure_search_result = _structure_hook(ProjectSearchResult)
+
 
 # Here's my small Complaining About The Modrinth API section.
 #
@@ -63,23 +102,56 @@ class ModrinthApi:
 
     def __init__(self, client: httpx.Client) -> None:
         self.client = client
-        self.client._transport = RetryTransport(self.client._transport)  # type: ignore
-        client.base_url = f"https://api.modrinth.com/{self.API_VERSION}"
-        client.headers = {
-            "user-agent": f"Mozilla/5.0 (kamuidrome/{VERSION}; https://github.com/Fuyukai/kamuidrome) AppleWebKit/537.3 (KHTML, like Packwiz)"  # noqa: E501
-        }
-        client.timeout = 10
-        client.follow_redirects = True
+
+        # projects and versions are looked up over and over again during dependency resolution,
+        # so remember everything we've seen for the lifetime of this client.
+        self._projects: dict[str, ProjectInfoFromProject] = {}
+        self._versions: dict[VersionId, ProjectVersion] = {}
+        # keyed by (project id, loaders, game versions), the latter two as their query strings.
+        self._project_versions: dict[tuple[ProjectId, str, str], list[ProjectVersion]] = {}
+        # dependency resolution looks versions up from several threads at once, and shared
+        # libraries get asked for by all of them. one lock per key means only the first one
+        # actually goes and fetches it.
+        self._project_version_locks: dict[tuple[ProjectId, str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+
+    @classmethod
+    def make_client(cls, transport: httpx.BaseTransport) -> httpx.Client:
+        """
+        Creates a new :class:`httpx.Client` set up for the Modrinth API, on top of the provided
+        transport.
+        """
+
+        # configuring everything up front instead of poking at an existing client's attributes
+        # (and its private ``_transport``) afterwards.
+        return httpx.Client(
+            base_url=f"https://api.modrinth.com/{cls.API_VERSION}",
+            headers={
+                "user-agent": f"Mozilla/5.0 (kamuidrome/{VERSION}; https://github.com/Fuyukai/kamuidrome) AppleWebKit/537.3 (KHTML, like Packwiz)"  # noqa: E501
+            },
+            timeout=10,
+            follow_redirects=True,
+            transport=RetryTransport(transport),
+        )
 
     def get_project_info(self, project_id: str) -> ProjectInfoFromProject:
         """
         Gets info about the specified project.
         """
 
+        try:
+            return self._projects[project_id]
+        except KeyError:
+            pass
+
         resp = self.client.get(f"/project/{project_id}")
         resp.raise_for_status()
         body = resp.json()
-        return CONVERTER.structure(body, ProjectInfoFromProject)
+        info = _structure_project(body, ProjectInfoFromProject)
+
+        # ``project_id`` might've been a slug.
+        self._projects[project_id] = self._projects[info.id] = info
+        return info
 
     def get_project_versions(
         self,
@@ -105,14 +177,38 @@ class ModrinthApi:
 
             params["game_versions"] = json.dumps(game_versions)
 
-        resp = self.client.get(f"/project/{project_id}/version", params=params)
-        resp.raise_for_status()
-        return CONVERTER.structure(resp.json(), list[ProjectVersion])
+        key = (project_id, params.get("loaders", ""), params.get("game_versions", ""))
+        try:
+            return self._project_versions[key]
+        except KeyError:
+            pass
+
+        with self._locks_lock:
+            key_lock = self._project_version_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            # somebody else might've fetched it whilst we were waiting.
+            try:
+                return self._project_versions[key]
+            except KeyError:
+                pass
+
+            resp = self.client.get(f"/project/{project_id}/version", params=params)
+            resp.raise_for_status()
+
+            result = _structure_version_list(resp.json(), list[ProjectVersion])
+            # and any of these can be looked up again by id later (e.g. when exporting), so save
+            # them there too.
+            for version in result:
+                self._versions.setdefault(version.id, version)
+
+            self._project_versions[key] = result
+            return result
 
     def get_projects_via_search(
         self,
         search_query: str,
-        *facets: str | list[str],
+        *facets: str | Sequence[str],
         index: Literal["relevance", "downloads", "follows", "newest", "updated"] = "relevance",
         offset: int = 0,
         limit: int = 100,
@@ -134,42 +230,70 @@ class ModrinthApi:
             },
         )
         resp.raise_for_status()
-        return CONVERTER.structure(resp.json(), ProjectSearchResult)
+        return _structure_search_result(resp.json(), ProjectSearchResult)
 
     def get_multiple_projects(self, projects: list[ProjectId]) -> list[ProjectInfoFromProject]:
         """
         Gets multiple projeects in one request.
         """
 
-        resp = self.client.get("/projects", params={"ids": json.dumps(projects)})
-        resp.raise_for_status()
+        missing = [id for id in projects if id not in self._projects]
+        if missing:
+            resp = self.client.get("/projects", params={"ids": json.dumps(missing)})
+            resp.raise_for_status()
+
+            for info in _structure_project_list(resp.json(), list[ProjectInfoFromProject]):
+                self._projects[info.id] = info
 
-        return CONVERTER.structure(resp.json(), list[ProjectInfoFromProject])
+        # modrinth just leaves out anything it doesn't know about (or that's been deleted), which
+        # would otherwise silently drop mods from whatever's using this.
+        not_found = [id for id in projects if id not in self._projects]
+        if not_found:
+            raise ValueError(f"Modrinth didn't return these projects: {', '.join(not_found)}")
+
+        return [self._projects[id] for id in projects]
 
     def get_single_version(self, version: VersionId) -> ProjectVersion:
         """
         Gets a single version for a project.
         """
 
+        try:
+            return self._versions[version]
+        except KeyError:
+            pass
+
         resp = self.client.get(f"/version/{version}")
         resp.raise_for_status()
 
-        return CONVERTER.structure(resp.json(), ProjectVersion)
+        result = self._versions[version] = _structure_version(resp.json(), ProjectVersion)
+        return result
 
     def get_multiple_versions(self, versions: list[VersionId]) -> list[ProjectVersion]:
         """
         Gets multiple versions in one request.
         """
 
-        resp = self.client.get(
-            "/versions",
-            params={
-                "ids": json.dumps(versions),
-            },
-        )
-        resp.raise_for_status()
+        missing = [id for id in versions if id not in self._versions]
+        if missing:
+            resp = self.client.get(
+                "/versions",
+                params={
+                    "ids": json.dumps(missing),
+                },
+            )
+            resp.raise_for_status()
+
+            for version in _structure_version_list(resp.json(), list[ProjectVersion]):
+                self._versions[version.id] = version
+
+        # modrinth just leaves out anything it doesn't know about (or that's been deleted), which
+        # would otherwise silently drop mods from whatever's using this.
+        not_found = [id for id in versions if id not in self._versions]
+        if not_found:
+            raise ValueError(f"Modrinth didn't return these versions: {', '.join(not_found)}")
 
-        return CONVERTER.structure(resp.json(), list[ProjectVersion])
+        return [self._versions[id] for id in versions]
 
     @contextmanager
     def get_file(self, url: str) -> Generator[httpx.Response, None, None]:
@@ -17,22 +17,33 @@
 # generic for no reason.
 
 import json
+import os
 import shutil
 import subprocess
-import tempfile
+import zipfile
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from io import StringIO
 from pathlib import Path
 from typing import Any
 
 import httpx
-import more_itertools
 from rich import print
 
+from kamuidrome.httpcache import MAX_AGE_EXTENSION
 from kamuidrome.meta import AvailablePackLoader
 from kamuidrome.modrinth.client import ModrinthApi
-from kamuidrome.modrinth.models import VersionId
+from kamuidrome.modrinth.models import ProjectVersion, VersionId
 from kamuidrome.pack import LocalPack
 
+#: How long loader version metadata is used from the HTTP cache before asking for it again, in
+#: seconds.
+LOADER_METADATA_MAX_AGE = 6 * 60 * 60
+
+# jars (and resource/shader packs) are already zip files, and pngs are already deflated, so
+# deflating them again just burns cpu time for basically zero gain.
+_PRECOMPRESSED_SUFFIXES = (".jar", ".zip", ".png", ".ogg")
+
 
 def _parse_forge_version(
     body: list[dict[str, Any]],
@@ -43,12 +54,12 @@ def _parse_forge_version(
     """
 
     for entry in body:
-        version = entry["version"]
-        requires = entry["requires"]
-
-        for i in requires:
-            if i["uid"] == "net.minecraft" and i["equals"] == game_version:
-                return version
+        # not every requirement has an exact version (some only have ``suggests``).
+        if any(
+            i["uid"] == "net.minecraft" and i.get("equals") == game_version
+            for i in entry["requires"]
+        ):
+            return entry["version"]
 
     raise ValueError("Couldn't find a valid legacyforge version!")
 
@@ -60,45 +71,189 @@ def select_latest_loader_version(
     Gets the latest version for the specified modloader.
     """
 
+    # this metadata changes maybe once a day, but packs get exported a lot more often than that.
+    # if the client has a caching transport, it gets to skip asking for it every single time.
+
     match loader:
         case AvailablePackLoader.FABRIC:
-            result = client.get("https://meta.fabricmc.net/v2/versions/loader")
+            result = client.get(
+                "https://meta.fabricmc.net/v2/versions/loader",
+                extensions={MAX_AGE_EXTENSION: LOADER_METADATA_MAX_AGE},
+            )
             result.raise_for_status()
             body: list[dict[str, Any]] = result.json()
 
-            return more_itertools.first(filter(lambda it: it["stable"] is True, body))["version"]
+            stable = next((it["version"] for it in body if it["stable"] is True), None)
+            if stable is None:
+                raise ValueError("Couldn't find a stable fabric loader version!")
+
+            return stable
 
         case AvailablePackLoader.QUILT:
-            result = client.get("https://meta.quiltmc.org/v3/versions/loader")
+            result = client.get(
+                "https://meta.quiltmc.org/v3/versions/loader",
+                extensions={MAX_AGE_EXTENSION: LOADER_METADATA_MAX_AGE},
+            )
             result.raise_for_status()
             body: list[dict[str, Any]] = result.json()
 
             return body[0]["version"]
 
         case AvailablePackLoader.LEGACY_FORGE:
-            result = client.get("https://meta.prismlauncher.org/v1/net.minecraftforge")
+            result = client.get(
+                "https://meta.prismlauncher.org/v1/net.minecraftforge",
+                extensions={MAX_AGE_EXTENSION: LOADER_METADATA_MAX_AGE},
+            )
             result.raise_for_status()
             return _parse_forge_version(result.json(), game_version)
 
         case AvailablePackLoader.NEOFORGE:
-            result = client.get("https://meta.prismlauncher.org/v1/net.neoforged")
+            result = client.get(
+                "https://meta.prismlauncher.org/v1/net.neoforged",
+                extensions={MAX_AGE_EXTENSION: LOADER_METADATA_MAX_AGE},
+            )
             result.raise_for_status()
             return _parse_forge_version(result.json(), game_version)
 
 
-# https://stackoverflow.com/a/69375880/15026456
-def make_archive(source: Path, destination: Path) -> None:
+def _get_git_head_info() -> tuple[str, str, str]:
+    """
+    Gets the commit hash, branch name, and commit subject for the current ``HEAD``.
+    """
+
+    # one git invocation rather than three separate ones. %D is a comma-separated list of refs
+    # pointing at the commit, e.g. ``HEAD -> main, origin/main, tag: v1.0``. the order isn't
+    # guaranteed (shallow clones put ``grafted`` first), and there's no ``HEAD -> `` entry at all
+    # when detached, in which case the branch is ``HEAD`` like ``git rev-parse --abbrev-ref HEAD``.
+    output = subprocess.check_output(
+        ["git", "log", "-1", "--format=%H%n%D%n%s", "HEAD"], encoding="utf-8"
+    )
+    commit, refs, subject = output.rstrip("\n").split("\n", 2)
+
+    branch = "HEAD"
+    for ref in refs.split(", "):
+        if ref.startswith("HEAD -> "):
+            branch = ref.removeprefix("HEAD -> ")
+            break
+
+    return commit, branch, subject
+
+
+def _copy_if_changed(source: str, destination: str) -> str:
+    """
+    Copies ``source`` to ``destination``, unless it looks like it's already been copied there.
+    """
+
+    # ``copy2`` keeps the modification time, so if the size and mtime both match then it's the
+    # same file as the last export and there's no point copying it again.
+    try:
+        src_stat = os.stat(source)
+        dst_stat = os.stat(destination)
+    except FileNotFoundError:
+        pass
+    else:
+        if src_stat.st_size == dst_stat.st_size and src_stat.st_mtime_ns == dst_stat.st_mtime_ns:
+            return destination
+
+    return shutil.copy2(source, destination)
+
+
+def _get_loader_version(pack: LocalPack, client: httpx.Client) -> str:
+    """
+    Gets the loader version to use for the provided pack, looking up the latest one if the pack
+    doesn't specify one.
+    """
+
+    loader_version = pack.metadata.loader.version
+    if loader_version is not None:
+        return loader_version
+
+    return select_latest_loader_version(
+        client,
+        pack.metadata.game_version,
+        pack.metadata.loader.type,
+    )
+
+
+def _make_index(pack: LocalPack, versions: list[ProjectVersion], loader_version: str) -> str:
     """
-    Creates a new archive from the given directory.
+    Creates the ``modrinth.index.json`` contents for the provided pack.
     """
 
-    base_name = destination.parent / destination.stem
-    shutil.make_archive(
-        str(base_name),
-        "zip",
-        root_dir=str(source),
+    print(
+        "[green]selected loader version[/green] "
+        f"[white]{pack.metadata.loader.mrpack_name} {loader_version}[/white]"
     )
 
+    files_struct: list[dict[str, Any]] = []
+    index = {
+        "formatVersion": 1,
+        "game": "minecraft",
+        "versionId": pack.metadata.version,
+        "name": pack.metadata.name,
+        "dependencies": {
+            "minecraft": pack.metadata.game_version,
+            pack.metadata.loader.mrpack_name: loader_version,
+        },
+        "files": files_struct,
+    }
+
+    # versions in this case means the indexed mods.
+    for version in versions:
+        version_file = version.primary_file
+        print("adding version file", version_file.filename)
+        body = {
+            "path": f"mods/{version_file.filename}",
+            "hashes": version_file.hashes,
+            "downloads": [version_file.url],
+            "fileSize": version_file.size,
+        }
+        files_struct.append(body)
+
+    # nothing reading this cares about whitespace, so don't write any.
+    return json.dumps(index, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def _write_mrpack_zip(
+    output: Path,
+    metadata: str,
+    pack_dir: Path,
+    directories: list[str],
+    make_index: Callable[[], str],
+) -> None:
+    """
+    Writes a new ``mrpack`` zip file directly from the pack directory.
+
+    ``make_index`` is only called once everything else has been written.
+    """
+
+    try:
+        with zipfile.ZipFile(output, mode="w", compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("overrides/kamuidrome.metadata", metadata)
+
+            for to_copy_dir in directories:
+                real_dir = pack_dir / to_copy_dir
+
+                for dirpath, _, filenames in os.walk(real_dir, followlinks=True):
+                    arc_dir = Path("overrides", to_copy_dir, os.path.relpath(dirpath, real_dir))
+
+                    for filename in filenames:
+                        zf.write(
+                            os.path.join(dirpath, filename),
+                            arcname=(arc_dir / filename).as_posix(),
+                            compress_type=(
+                                zipfile.ZIP_STORED
+                                if filename.endswith(_PRECOMPRESSED_SUFFIXES)
+                                else zipfile.ZIP_DEFLATED
+                            ),
+                        )
+
+            zf.writestr("modrinth.index.json", make_index())
+    except BaseException:
+        # don't leave half a pack lying around.
+        output.unlink(missing_ok=True)
+        raise
+
 
 def create_mrpack(
     pack: LocalPack,
@@ -113,113 +268,72 @@ def create_mrpack(
 
     # initially i tried writing directly to the zipfilee, but python ``zipfile`` is an evil module
     # that sucks (i miss java.nio).
-    # so instead we just make a temporary directory and use ``shutil.make_archive``.
-
-    with tempfile.TemporaryDirectory() as dir:
-        tmpdir_path = Path(dir)
-        dot_minecraft = tmpdir_path / "overrides"
-        dot_minecraft.mkdir(exist_ok=False, parents=False)
-
-        version_ids: list[VersionId] = []
-        for mod in pack.mods.values():
-            if server_only and mod.client_side_only:
-                print(f"[yellow]not exporting {mod.name}[/yellow]")
-                continue
-
-            print(f"[yellow] definitely exporting {mod.name} ({mod.version_id})")
-            version_ids.append(mod.version_id)
-
-        versions = api.get_multiple_versions(version_ids)
-        files = [version.primary_file for version in versions]
-
-        loader_version = pack.metadata.loader.version
-        if loader_version is None:
-            loader_version = select_latest_loader_version(
-                api.client,
-                pack.metadata.game_version,
-                pack.metadata.loader.type,
-            )
-
-        print(
-            "[green]selected loader version[/green] "
-            f"[white]{pack.metadata.loader.mrpack_name} {loader_version}[/white]"
-        )
-
-        files_struct: list[dict[str, Any]] = []
-        index = {
-            "formatVersion": 1,
-            "game": "minecraft",
-            "versionId": pack.metadata.version,
-            "name": pack.metadata.name,
-            "dependencies": {
-                "minecraft": pack.metadata.game_version,
-                pack.metadata.loader.mrpack_name: loader_version,
-            },
-            "files": files_struct,
-        }
-
-        # versions in this case means the indexed mods.
-        for version_file in files:
-            print("adding version file", version_file.filename)
-            body = {
-                "path": f"mods/{version_file.filename}",
-                "hashes": version_file.hashes,
-                "downloads": [version_file.url],
-                "fileSize": version_file.size,
-            }
-            files_struct.append(body)
-
-        with (tmpdir_path / "modrinth.index.json").open(mode="w") as f:
-            json.dump(index, f, sort_keys=True)
-
-        with (tmpdir_path / "overrides" / "kamuidrome.metadata").open(mode="w") as f:
-            f.reconfigure(line_buffering=True)
-
-            # Line 1: Pack name
-            f.write(pack.metadata.name)
-            f.write("\n")
-            # Line 2: Pack version
-            f.write(pack.metadata.version)
-            f.write("\n")
-
-            # Line 3: (Commit hash, Branch name, Commit message)
-            try:
-                git_buf = StringIO()
-                current_commit = subprocess.check_output(
-                    "git rev-parse HEAD".split(), encoding="utf-8"
-                ).strip()
-                current_branch = subprocess.check_output(
-                    "git rev-parse --abbrev-ref HEAD".split(), encoding="utf-8"
-                ).strip()
-                commit_message = subprocess.check_output(
-                    "git show-branch --no-name HEAD".split(), encoding="utf-8"
-                ).strip()
-
-                git_buf.write(current_commit)
-                git_buf.write(" ")
-                git_buf.write(current_branch)
-                git_buf.write(" ")
-                git_buf.write(commit_message)
-                git_line = git_buf.getvalue()
-            except subprocess.SubprocessError:
-                git_line = ""
-
-            f.write(git_line)
-            f.write("\n")
-
-        directories = ["config", "mods", *pack.metadata.include_directories]
-
-        for to_copy_dir in directories:
-            real_dir = (pack.directory / to_copy_dir).resolve()
-            shutil.copytree(real_dir, dot_minecraft / to_copy_dir)
+    # that's still true, but going through a temporary directory and ``shutil.make_archive`` meant
+    # reading every jar twice and writing it once more, and deflating them all for no reason.
+    # so the zip is written in one go now.
+
+    version_ids: list[VersionId] = []
+    for mod in pack.mods.values():
+        if server_only and mod.client_side_only:
+            print(f"[yellow]not exporting {mod.name}[/yellow]")
+            continue
+
+        print(f"[yellow] definitely exporting {mod.name} ({mod.version_id})")
+        version_ids.append(mod.version_id)
+
+    f = StringIO()
+    # Line 1: Pack name
+    f.write(pack.metadata.name)
+    f.write("\n")
+    # Line 2: Pack version
+    f.write(pack.metadata.version)
+    f.write("\n")
+
+    # Line 3: (Commit hash, Branch name, Commit message)
+    try:
+        current_commit, current_branch, commit_message = _get_git_head_info()
+        git_line = f"{current_commit} {current_branch} {commit_message}"
+    except subprocess.SubprocessError:
+        git_line = ""
+
+    f.write(git_line)
+    f.write("\n")
+    metadata = f.getvalue()
+
+    directories = ["config", "mods", *pack.metadata.include_directories]
+
+    # looking up the versions and the loader version is network-bound, whereas writing out the
+    # pack contents is disk-bound, so do them both at the same time. this is why the index is
+    # the last thing to be written.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        versions_future = pool.submit(api.get_multiple_versions, version_ids)
+
+        loader_future = pool.submit(_get_loader_version, pack, api.client)
+
+        def make_index() -> str:
+            return _make_index(pack, versions_future.result(), loader_future.result())
 
         if ci_mode:
-            shutil.copytree(tmpdir_path, output, dirs_exist_ok=True)
+            dot_minecraft = output / "overrides"
+            dot_minecraft.mkdir(parents=True, exist_ok=True)
+
+            (dot_minecraft / "kamuidrome.metadata").write_text(metadata, encoding="utf-8")
+
+            # straight into the output directory; ``copy2`` already uses ``sendfile`` where it
+            # can. CI tends to export over the top of the last export, so unchanged files are
+            # skipped.
+            for to_copy_dir in directories:
+                shutil.copytree(
+                    pack.directory / to_copy_dir,
+                    dot_minecraft / to_copy_dir,
+                    dirs_exist_ok=True,
+                    copy_function=_copy_if_changed,
+                )
+
+            (output / "modrinth.index.json").write_text(make_index(), encoding="utf-8")
         else:
-            actual_file = output.with_suffix(".zip")
-            make_archive(tmpdir_path, output)
-            actual_file.rename(output)
+            _write_mrpack_zip(output, metadata, pack.directory, directories, make_index)
 
-        print(f"[green]written output to [/green] [white]{output}[/white] ({ci_mode=})")
+    print(f"[green]written output to [/green] [white]{output}[/white] ({ci_mode=})")
 
     return output
@@ -1,4 +1,5 @@
-from collections.abc import Sequence
+from collections.abc import Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
 
 from rich import print
 
@@ -13,6 +14,9 @@ from kamuidrome.modrinth.models import (
 
 type VersionResult = Sequence[tuple[ProjectInfoMixin, ProjectVersion]]
 
+#: The maximum number of dependencies on the same level to resolve at once.
+MAX_CONCURRENT_DEPENDENCIES = 8
+
 # Hardcoded Modrinth project IDs used to swap out dependencies easily.
 
 FABRIC_API_VERSION = ProjectId("P7dR8mSH")
@@ -34,12 +38,15 @@ def resolve_latest_version(
     modrinth: ModrinthApi,
     info: ProjectInfoMixin | ProjectId,
     allow_unstable: bool = False,
+    verbose: bool = False,
 ) -> ProjectVersion:
     """
     Resolves the latest matching version for the specified mod.
 
     If ``allow_unstable`` is False, then the most recent *stable* version is chosen; otherwise,
     unstable (alpha and beta) versions will be picked.
+
+    If ``verbose`` is True, every rejected version is printed rather than just how many there were.
     """
 
     if not isinstance(info, ProjectInfoMixin):
@@ -58,11 +65,6 @@ def resolve_latest_version(
     # and only fall back to our alternative loader if we fail to select any version for the
     # primary loader.
 
-    versions = sorted(versions, key=lambda it: it.date_published, reverse=True)
-
-    selected_version: ProjectVersion | None = None
-    secondary_version: ProjectVersion | None = None
-
     primary_loader: str
     secondary_loader: str | None = None
 
@@ -77,61 +79,69 @@ def resolve_latest_version(
         if len(pack.available_loaders) == 2:
             secondary_loader = pack.available_loaders[1]
 
-    # we do a single-pass strategy here using two local variables.
-    for version in versions:
-        title = info.title
+    # we do a single pass here, keeping the newest version of each kind we care about, in order
+    # of preference:
+    # 1. a release version for our preferred loader (or any version, if unstable is allowed).
+    # 2. a non-release version for our preferred loader.
+    # 3. any version for our non-preferred loader.
+    # sorting the whole list by date just to pick (at most) one of each is a waste.
+    selected_version: ProjectVersion | None = None
+    fallback_version: ProjectVersion | None = None
+    secondary_version: ProjectVersion | None = None
+    rejected: list[ProjectVersion] = []
 
+    for version in versions:
         if primary_loader in version.loaders:
-            # a bit of trickiness here; if we find a release version for our preferred loader,
-            # that's the version we want to pick *always*.
-            # if we find a non-release version for our non-preferred loader, we only select it
-            # if we haven't selected a release before, then continue on to try and find a release
-            # version.
-
             if version.version_type == "release" or allow_unstable:
-                selected_version = version
-                print(
-                    f"[green]selected version[/green] "
-                    f"[bold white]{version.version_number}[/bold white] "
-                    f"for [bold white]{title}[/bold white]"
-                )
-                break
-            elif (  # noqa: RET508
-                selected_version is None
+                if (
+                    selected_version is None
+                    or version.date_published > selected_version.date_published
+                ):
+                    selected_version = version
+
+            elif (
+                fallback_version is None or version.date_published > fallback_version.date_published
             ):
-                selected_version = version
-                print(
-                    f"[italic yellow]saving fallback version[/italic yellow] "
-                    f"[bold white]{version.version_number}[/bold white] ({version.loaders}) "
-                    f"for [bold white]{title}[/bold white]"
-                )
-                continue
-
-        # only assign if ``secondary_version`` is None, because we don't want to replace it with
-        # an older version for no reason.
-        if all(
-            (
-                secondary_loader is not None,
-                secondary_loader in version.loaders,
-                secondary_version is None,
-            )
-        ):
-            print(
-                f"[italic yellow]saving fallback version[/italic yellow] "
-                f"[bold white]{version.version_number}[/bold white] ({version.loaders}) "
-                f"for [bold white]{title}[/bold white]"
-            )
-            # never break here; there might be a primary version coming *after* this one.
-            secondary_version = version
+                fallback_version = version
+
+        elif secondary_loader is not None and secondary_loader in version.loaders:
+            if (
+                secondary_version is None
+                or version.date_published > secondary_version.date_published
+            ):
+                secondary_version = version
+
         else:
+            rejected.append(version)
+
+    if verbose:
+        for version in rejected:
             print(
                 f"[red]rejected version[/red] [bold white]{version.version_number}[/bold white] "
-                f"for [bold white]{title}[/bold white]"
+                f"for [bold white]{info.title}[/bold white]"
             )
+    elif rejected:
+        print(
+            f"[red]rejected {len(rejected)} versions[/red] "
+            f"for [bold white]{info.title}[/bold white]"
+        )
 
     if selected_version is not None:
+        print(
+            f"[green]selected version[/green] "
+            f"[bold white]{selected_version.version_number}[/bold white] "
+            f"for [bold white]{info.title}[/bold white]"
+        )
         return selected_version
 
+    if fallback_version is not None:
+        print(
+            f"[italic yellow]selected fallback version[/italic yellow] "
+            f"[bold white]{fallback_version.version_number}[/bold white] "
+            f"({fallback_version.loaders}) for [bold white]{info.title}[/bold white]"
+        )
+        return fallback_version
+
     if secondary_version is not None:
         title = info.title if isinstance(info, ProjectInfoFromProject) else secondary_version.name
         print(
@@ -154,7 +164,9 @@ def transform_dependencies(pack: PackMetadata, projects: list[ProjectId]) -> lis
 
     # TODO: make this more generic.
 
-    if not pack.loader.sinytra_compat:
+    # most dependency lists don't have anything that needs swapping, so don't bother building a
+    # new list for them.
+    if not pack.loader.sinytra_compat or DEPENDENCY_SWAPS.keys().isdisjoint(projects):
         return projects
 
     return [DEPENDENCY_SWAPS.get(i, i) for i in projects]
@@ -165,51 +177,60 @@ def get_set_of_dependencies(pack: PackMetadata, version: ProjectVersion) -> list
     Gets the appropriate set of required dependencies given the provided :class:`.ProjectVersion`.
     """
 
-    resolved: list[ProjectId] = []
-    for dep in version.relationships:
-        if dep.dependency_type != "required":
-            continue
-
-        if pack.loader.sinytra_compat:
-            resolved.append(DEPENDENCY_SWAPS.get(dep.project_id, dep.project_id))
-        else:
-            resolved.append(dep.project_id)
-
-    return resolved
+    required = [
+        dep.project_id for dep in version.relationships if dep.dependency_type == "required"
+    ]
+    return transform_dependencies(pack, required)
 
 
 def resolve_dependency_versions(
     pack: PackMetadata,
     modrinth: ModrinthApi,
-    selected_version: ProjectVersion,
+    *selected_versions: ProjectVersion,
     _seen: set[ProjectId] | None = None,
-) -> VersionResult:
+    verbose: bool = False,
+) -> Iterator[tuple[ProjectInfoMixin, ProjectVersion]]:
     """
-    Recursively resolves the dependency versions of the provided selected version.
+    Recursively resolves the dependency versions of the provided selected versions.
+
+    This is a generator; nothing is resolved until it's iterated over.
     """
 
-    dependencies = get_set_of_dependencies(pack, selected_version)
+    dependencies = [
+        dependency
+        for version in selected_versions
+        for dependency in get_set_of_dependencies(pack, version)
+    ]
 
-    seen: set[ProjectId] = _seen if _seen is not None else set()
+    def _resolve(info: ProjectInfoMixin) -> ProjectVersion:
+        return resolve_latest_version(pack, modrinth, info, verbose=verbose)
 
-    resolved: list[ProjectVersion] = []
+    seen: set[ProjectId] = _seen if _seen is not None else set()
+    # the roots are already resolved, so a dependency cycle back to one shouldn't resolve it again.
+    seen.update(version.project_id for version in selected_versions)
 
     while True:
-        if not dependencies:
+        # dict.fromkeys is an ordered de-duplication.
+        to_resolve = [project for project in dict.fromkeys(dependencies) if project not in seen]
+        if not to_resolve:
             break
 
+        seen.update(to_resolve)
         next_dependencies: list[ProjectId] = []
 
-        for project in dependencies:
-            if project in seen:
-                continue
+        # fetch all of the project info for this level of the tree in one request, instead of
+        # letting ``resolve_latest_version`` fetch it one project at a time.
+        infos = modrinth.get_multiple_projects(to_resolve)
 
-            seen.add(project)
-            selected_version = resolve_latest_version(pack, modrinth, project)
-            resolved.append(selected_version)
+        # nothing on the same level depends on anything else on that level, so the version lookups
+        # can all happen at once. ``map`` keeps them in order.
+        with ThreadPoolExecutor(
+            max_workers=min(len(infos), MAX_CONCURRENT_DEPENDENCIES) or 1
+        ) as pool:
+            versions = list(pool.map(_resolve, infos))
+
+        for project_info, selected_version in zip(infos, versions, strict=True):
+            yield project_info, selected_version
             next_dependencies += get_set_of_dependencies(pack, selected_version)
 
         dependencies = next_dependencies
-
-    project_infos = modrinth.get_multiple_projects([i.project_id for i in resolved])
-    return list(zip(project_infos, resolved, strict=True))
@@ -1,20 +1,25 @@
 import enum
 import json
+import os
 import shutil
+import sys
+import tomllib
 from collections import deque
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import cast
+from typing import Any, cast
 
 import attr
 import cattrs
+from cattrs.gen import make_dict_unstructure_fn, override
 from rich import print
-from rich.progress import Progress
-from tomlkit import load as toml_load
+from rich.progress import Progress, TaskID
 
 from kamuidrome.cache import ModCache
-from kamuidrome.meta import LocalMetadata, PackMetadata
+from kamuidrome.meta import DeployMode, LocalMetadata, PackMetadata
 from kamuidrome.modrinth.client import ModrinthApi
-from kamuidrome.modrinth.models import ModSideValue, ProjectId, VersionId
+from kamuidrome.modrinth.models import ModSideValue, ProjectId, ProjectVersion, VersionId
 from kamuidrome.modrinth.utils import VersionResult
 from kamuidrome.prism import (
     cleanup_from_index,
@@ -22,6 +27,15 @@ from kamuidrome.prism import (
     get_prism_instances_directory,
 )
 
+if sys.platform == "linux":
+    import fcntl
+
+#: The maximum number of mods to download at once.
+MAX_CONCURRENT_DOWNLOADS = 8
+
+#: How many downloaded bytes to collect before advancing a mod's progress bar.
+PROGRESS_UPDATE_BYTES = 256 * 1024
+
 
 class ModSide(enum.Enum):
     """
@@ -63,21 +77,93 @@ class InstalledMod:
     #: If true, this is a client-side only mod.
     client_side_only: bool = attr.ib(default=False)
 
+    #: The real file name of this mod's jar. Older indexes don't have this, in which case it's
+    #: looked up from the cache instead.
+    real_file_name: str | None = attr.ib(default=None)
+
+
+# older indexes don't have ``real_file_name``, and writing it out as ``null`` for all of those would
+# make for a pointless diff in every single pack the first time it's touched.
+cattrs.global_converter.register_unstructure_hook(
+    InstalledMod,
+    make_dict_unstructure_fn(
+        InstalledMod,
+        cattrs.global_converter,
+        real_file_name=override(omit_if_default=True),
+    ),
+)
+
+# same deal as in client.py; look the hooks up once rather than dispatching on every call. the
+# unstructure hook is looked up for the declared type, too, so the values don't need dispatching
+# one at a time either.
+_structure_mod_index = cast(
+    Callable[[Any, type[Any]], dict[ProjectId, InstalledMod]],
+    cattrs.global_converter._structure_func.dispatch(dict[ProjectId, InstalledMod]),  # type: ignore
+)
+_unstructure_mod_index = cast(
+    Callable[[Any], dict[str, Any]],
+    cattrs.global_converter._unstructure_func.dispatch(dict[ProjectId, InstalledMod]),  # type: ignore
+)
+
+
+def _remove_tree(path: Path) -> None:
+    """
+    Removes a directory tree, or just the symlink if ``path`` is a symlink to one.
+    """
+
+    # whole directories get deployed as symlinks, so these are quite often links left over from a
+    # previous deploy. ``rmtree`` refuses to touch those (and ``ignore_errors`` hides that), and
+    # then making the new symlink fails. the contents are already unlinked, not followed, by
+    # ``rmtree`` itself.
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        return
+    except (IsADirectoryError, PermissionError):
+        # a real directory. (linux says EISDIR, macos says EPERM.)
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def _clone_file(source: Path, destination: Path) -> None:
+    """
+    Makes a copy-on-write clone of ``source`` at ``destination``, falling back to a regular copy if
+    that isn't possible.
+    """
+
+    # whatever's there might be a leftover symlink into the cache (e.g. from a symlink-mode deploy),
+    # and opening that for writing would truncate the very jar we're about to clone.
+    destination.unlink(missing_ok=True)
+
+    # linux is the only one that can do this without ctypes. it works on btrfs, xfs, bcachefs, and
+    # friends, and it's instant, and takes up no extra space until one of them gets changed.
+    if sys.platform == "linux":
+        try:
+            with source.open("rb") as src, destination.open("xb") as dst:
+                fcntl.ioctl(dst.fileno(), fcntl.FICLONE, src.fileno())
+        except OSError:
+            # not supported by this filesystem, or across two different ones.
+            destination.unlink(missing_ok=True)
+        else:
+            shutil.copystat(source, destination)
+            return
+
+    shutil.copy2(source, destination)
 
+
+@attr.s(slots=True, kw_only=True)
 class LocalPack:
     """
     A single, local modpack.
     """
 
-    def __init__(
-        self,
-        pack_dir: Path,
-        metadata: PackMetadata,
-        mods: dict[ProjectId, InstalledMod],
-    ) -> None:
-        self.directory: Path = pack_dir
-        self.metadata: PackMetadata = metadata
-        self.mods: dict[ProjectId, InstalledMod] = mods
+    #: The directory this pack lives in.
+    directory: Path = attr.ib()
+
+    #: The metadata from this pack's ``pack.toml``.
+    metadata: PackMetadata = attr.ib()
+
+    #: The mods in this pack's index.
+    mods: dict[ProjectId, InstalledMod] = attr.ib(factory=dict[ProjectId, InstalledMod])
 
     def _write_index(self):
         """
@@ -85,10 +171,58 @@ class LocalPack:
         """
 
         mod_index = self.directory / "mods" / "mod-index.json"
-        serialised = cattrs.unstructure(self.mods)
+        serialised = _unstructure_mod_index(self.mods)
+
+        # this one stays indented, as it's checked into git and people read the diffs.
+        content = json.dumps(serialised, indent=4, sort_keys=True)
+
+        # write-then-rename, so that getting interrupted doesn't leave a truncated index behind.
+        # not a ``NamedTemporaryFile``, as that'd make the index 0600.
+        temp_index = mod_index.with_name(".mod-index.json.tmp")
+        try:
+            temp_index.write_text(content, encoding="utf-8")
+            os.replace(temp_index, mod_index)
+        except BaseException:
+            temp_index.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _download_version(
+        api: ModrinthApi,
+        cache: ModCache,
+        version: ProjectVersion,
+        progress: Progress,
+        task: TaskID,
+    ) -> None:
+        """
+        Downloads the primary file for a single version into the cache.
+        """
+
+        selected_file = version.primary_file
+
+        # every ``progress.update`` takes rich's lock, and the chunks are only a few kilobytes each,
+        # so with several downloads going at once they'd mostly be fighting over that instead.
+        pending = 0
 
-        with mod_index.open(mode="w") as f:
-            json.dump(serialised, f, indent=4, sort_keys=True)
+        def advance(size: int) -> None:
+            nonlocal pending
+            pending += size
+
+            if pending >= PROGRESS_UPDATE_BYTES:
+                progress.update(task, advance=pending)
+                pending = 0
+
+        with api.get_file(selected_file.url) as resp:
+            cache.save_mod_from_response(
+                resp,
+                version.project_id,
+                version.id,
+                selected_file.filename,
+                progress=advance,
+            )
+
+        # this also covers whatever was left in ``pending``.
+        progress.update(task, completed=selected_file.size)
 
     def download_and_add_mods(
         self,
@@ -118,30 +252,56 @@ class LocalPack:
 
             all_mods = progress.add_task("[green]Downloading mods...", total=len(versions))
 
-            for project, version in versions:
-                old_metadata = self.mods.get(project.id)
-                exists_already = cache.get_real_filename(version.project_id, version.id) is not None
+            # downloads are entirely network bound, so do them all at once up front and only
+            # deal with the index afterwards.
+            pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS)
+            try:
+                downloads: list[Future[None]] = []
+
+                for project, version in versions:
+                    current_task = tasks_by_mod[version.project_id]
+
+                    # the metadata alone isn't enough, as somebody may have deleted the jar
+                    # out from underneath us, and then we'd never be able to download it again.
+                    if (
+                        cache.get_mod_path(version.project_id, version.id).exists()
+                        and cache.get_real_filename(version.project_id, version.id) is not None
+                    ):
+                        print(
+                            f"[yellow]skipping[/yellow] "
+                            f"[bold white]{project.title}[/bold white] download as it exists "
+                            f"already"
+                        )
 
-                current_task = tasks_by_mod[version.project_id]
+                        progress.remove_task(current_task)
+                        progress.update(all_mods, advance=1)
+                        continue
 
-                if exists_already:
-                    print(
-                        f"[yellow]skipping[/yellow] "
-                        f"[bold white]{project.title}[/bold white] download as it exists already"
+                    downloads.append(
+                        pool.submit(
+                            self._download_version, api, cache, version, progress, current_task
+                        )
                     )
 
-                    progress.remove_task(current_task)
-                else:
-                    selected_file = version.primary_file
-
-                    with api.get_file(selected_file.url) as resp:
-                        for chunk in cache.save_mod_from_response(
-                            resp, version.project_id, version.id, selected_file.filename
-                        ):
-                            progress.update(current_task, advance=chunk)
-
-                    progress.update(current_task, completed=selected_file.size)
+                for download in as_completed(downloads):
+                    download.result()
+                    progress.update(all_mods, advance=1)
+            except BaseException:
+                # if anything fails (or somebody hits ^C), don't go and download the whole rest of
+                # the pack first; only the downloads already in progress get to finish.
+                pool.shutdown(wait=True, cancel_futures=True)
+
+                # the index only gets updated once *everything* is downloaded, as half an update
+                # could leave mods without their dependencies. but whatever did finish downloading
+                # can at least be remembered by the cache, so that retrying doesn't download it all
+                # over again.
+                cache.flush()
+                raise
+            else:
+                pool.shutdown()
 
+            for project, version in versions:
+                old_metadata = self.mods.get(project.id)
                 new_checksum = cache.get_file_checksum(version.project_id, version.id)
                 selected = selected_mod == version.project_id
                 if old_metadata is not None:
@@ -162,7 +322,6 @@ class LocalPack:
                             f"[yellow]not updating[/yellow] "
                             f"[bold white]{project.title}[/bold white] metadata as it is pinned"
                         )
-                        progress.update(all_mods, advance=1)
                         continue
 
                     if not selected:
@@ -173,33 +332,43 @@ class LocalPack:
                     project_id=version.project_id,
                     version=version.version_number,
                     version_id=version.id,
-                    checksum=cast(str, cache.get_file_checksum(version.project_id, version.id)),
+                    checksum=cast(str, new_checksum),
                     selected=selected,
                     pinned=False,
                     client_side_only=project.server_side == ModSideValue.UNSUPPORTED,
+                    real_file_name=version.primary_file.filename,
                 )
 
-                progress.update(all_mods, advance=1)
-
+        # if we crash before this, the jars are still there but unknown to the cache, so they'll
+        # just get downloaded again next time.
+        cache.flush()
         self._write_index()
 
-    def _validate_downloaded_mods(self, cache: ModCache) -> bool:
+    def _collect_downloaded_mods(self, cache: ModCache) -> list[tuple[str, Path]] | None:
         """
-        Validates downloaded mods to check if they all exist.
+        Gets the ``(file name, cache path)`` pair for every indexed mod, or None if any of them
+        haven't been downloaded.
         """
 
+        found: list[tuple[str, Path]] = []
         any_error = False
 
         for project_id, mod in self.mods.items():
             path = cache.get_mod_path(project_id, mod.version_id)
-            if not path.exists():
+            # going through the cache means reading every project's ``metadata.json``.
+            file_name = mod.real_file_name or cache.get_real_filename(project_id, mod.version_id)
+
+            if file_name is None or not path.exists():
                 print(
                     f"[red]missing mod:[/red] "
                     f"[white]{mod.name}[/white] ([white]{mod.version}[/white])"
                 )
                 any_error = True
+                continue
 
-        return not any_error
+            found.append((file_name, path))
+
+        return None if any_error else found
 
     def _setup_instance_firsttime(
         self,
@@ -210,15 +379,15 @@ class LocalPack:
         """
 
         mods_dir = instance_path / "mods"
-        shutil.rmtree(mods_dir, ignore_errors=True)
+        _remove_tree(mods_dir)
         mods_dir.mkdir(exist_ok=False, parents=False)
 
         configs_dir = instance_path / "config"
-        shutil.rmtree(configs_dir, ignore_errors=True)
+        _remove_tree(configs_dir)
 
         # path traversal! oh no!
         for dir in self.metadata.include_directories:
-            shutil.rmtree(instance_path / dir, ignore_errors=True)
+            _remove_tree(instance_path / dir)
 
     def deploy_to_directory(
         self,
@@ -230,7 +399,10 @@ class LocalPack:
         Deploys the symbolic links to the provided directory.
         """
 
-        if not self._validate_downloaded_mods(cache):
+        # this has to happen before anything in the instance gets touched. everything it looks up
+        # is needed for linking the mods anyway, so it's only done the once.
+        downloaded_mods = self._collect_downloaded_mods(cache)
+        if downloaded_mods is None:
             print("[red]unable to validate downloaded mods.[/red] try 'kamuidrome download' first.")
             return 1
 
@@ -247,18 +419,47 @@ class LocalPack:
             cleanup_from_index(deploy_path, index_path)
 
         symlink_index: list[str] = []
+        copied_index: list[str] = []
+        deploy_mode = DeployMode.SYMLINK if localmeta is None else localmeta.deploy_mode
 
         def symlink(symlink_file: Path, original: Path, is_dir: bool) -> None:
             symlink_file.symlink_to(original, target_is_directory=is_dir)
             symlink_index.append(str(symlink_file))
 
+        def place_jar(target_file: Path, original: Path) -> None:
+            match deploy_mode:
+                case DeployMode.SYMLINK:
+                    symlink(target_file, original, is_dir=False)
+                    return
+
+                case DeployMode.REFLINK:
+                    _clone_file(original, target_file)
+
+                case DeployMode.COPY:
+                    # same as in ``_clone_file``; don't write through an old symlink.
+                    target_file.unlink(missing_ok=True)
+                    shutil.copy2(original, target_file)
+
+            copied_index.append(str(target_file))
+
+        placed = {
+            DeployMode.SYMLINK: "linked",
+            DeployMode.REFLINK: "cloned",
+            DeployMode.COPY: "copied",
+        }[deploy_mode]
+
         # step 2: symlink the custom directories
         our_base_dir = self.directory.resolve()
         include_directories = ["config", *self.metadata.include_directories]
 
+        # one directory listing answers "does it exist" for all of the top-level ones. nested ones
+        # (``foo/bar``) aren't in it, so those still get checked on their own.
+        with os.scandir(our_base_dir) as it:
+            present = {entry.name for entry in it}
+
         for directory in include_directories:
             potential_dir = our_base_dir / directory
-            if not potential_dir.exists():
+            if directory not in present and not potential_dir.exists():
                 print(f"[yellow]skipping dir[/yellow] [white]{potential_dir}[/white] (not found)")
                 continue
 
@@ -277,34 +478,45 @@ class LocalPack:
         # step 3: symlink found mod jar files
         our_mods_dir = our_base_dir / "mods"
         deployed_mods_dir = deploy_path / "mods"
-        for file in our_mods_dir.iterdir():
-            if file.suffix != ".jar":
-                continue
 
-            # don't overwrite if there's a ``.disabled`` in the target directory.
-            target_file = deployed_mods_dir / file.name
-            if target_file.with_suffix(".jar.disabled").exists():
-                print(f"[yellow]skipping deploying[/yellow] [white]{target_file.name}[/white]")
-                continue
+        # don't overwrite if there's a ``.disabled`` in the target directory. these are all
+        # gathered up front, rather than checking for every single mod.
+        disabled: set[str]
+        try:
+            with os.scandir(deployed_mods_dir) as it:
+                disabled = {
+                    entry.name.removesuffix(".disabled")
+                    for entry in it
+                    if entry.name.endswith(".jar.disabled")
+                }
+        except FileNotFoundError:
+            disabled = set()
+
+        with os.scandir(our_mods_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".jar"):
+                    continue
 
-            symlink(target_file, file, is_dir=False)
+                target_file = deployed_mods_dir / entry.name
+                if entry.name in disabled:
+                    print(f"[yellow]skipping deploying[/yellow] [white]{entry.name}[/white]")
+                    continue
 
-            print(f"[green]linked included mod[/green] [white]{target_file}[/white]")
+                place_jar(target_file, Path(entry.path))
 
-        # step 4: symlink mods from cache
-        for mod in self.mods.values():
-            actual_file_location = cache.get_mod_path(mod.project_id, mod.version_id)
-            actual_file_name = cache.get_real_filename(mod.project_id, mod.version_id)
-            assert actual_file_name, "don't fuck about with me!"
+                print(f"[green]{placed} included mod[/green] [white]{target_file}[/white]")
 
+        # step 4: symlink mods from cache
+        for actual_file_name, actual_file_location in downloaded_mods:
             target_file = deployed_mods_dir / actual_file_name
-            if target_file.with_suffix(".jar.disabled").exists():
+            if actual_file_name in disabled:
                 print(f"[yellow]skipping deploying[/yellow] [white]{target_file.name}[/white]")
                 continue
 
-            symlink(target_file, actual_file_location.resolve(), is_dir=False)
+            # the cache path is already resolved.
+            place_jar(target_file, actual_file_location)
 
-            print(f"[green]linked managed mod[/green] [white]{target_file}[/white]")
+            print(f"[green]{placed} managed mod[/green] [white]{target_file}[/white]")
 
         # step 5: symlink local directories
         if localmeta is not None:
@@ -317,8 +529,7 @@ class LocalPack:
                 symlink(their_extra_dir, our_extra_dir, is_dir=True)
                 print(f"[green]linked extra dir[/green] [white]{our_extra_dir}[/white]")
 
-        with index_path.open(mode="w") as f:
-            json.dump(symlink_index, f)
+        index_path.write_text(json.dumps({"symlinks": symlink_index, "copies": copied_index}))
 
         return 0
 
@@ -329,17 +540,12 @@ class LocalPack:
         Deploys a modpack to the specified Prism Launcher instance.
         """
 
-        if not self._validate_downloaded_mods(cache):
-            print("[red]unable to validate downloaded mods.[/red] try 'kamuidrome download' first.")
-            return 1
-
+        # the mods get validated by ``deploy_to_directory``.
         prism_dir = get_prism_instances_directory()
         instance_dir = find_minecraft_dir(prism_dir, instance_name)
         instance_dir = instance_dir.resolve()
 
-        self.deploy_to_directory(cache, instance_dir, localmeta)
-
-        return 0
+        return self.deploy_to_directory(cache, instance_dir, localmeta)
 
     def pin(self, mod_name: str) -> int:
         """
@@ -349,8 +555,9 @@ class LocalPack:
         try:
             selected_mod = self.mods[ProjectId(mod_name)]
         except KeyError:
+            lowered = mod_name.lower()
             for mod in self.mods.values():
-                if mod.name.lower() == mod_name.lower():
+                if mod.name.lower() == lowered:
                     selected_mod = mod
                     break
             else:
@@ -403,16 +610,17 @@ def load_local_pack(pack_dir: Path) -> LocalPack:
     Loads a :class:`.LocalPack` from the specified directory.
     """
 
-    with (pack_dir / "pack.toml").open() as f:
-        raw_data = toml_load(f)
+    # this is only ever read here, so there's no need for tomlkit's (slow) round-tripping.
+    with (pack_dir / "pack.toml").open("rb") as f:
+        raw_data = tomllib.load(f)
         pack_meta = cattrs.structure(raw_data, PackMetadata)
 
+    selected_mods: dict[ProjectId, InstalledMod]
     try:
         mods_index_path = pack_dir / "mods" / "mod-index.json"
-        with mods_index_path.open() as f:
-            raw_selected = json.load(f)
-            selected_mods = cattrs.structure(raw_selected, dict[ProjectId, InstalledMod])
+        raw_selected = json.loads(mods_index_path.read_bytes())
+        selected_mods = _structure_mod_index(raw_selected, dict[ProjectId, InstalledMod])
     except FileNotFoundError:
-        selected_mods: dict[ProjectId, InstalledMod] = {}
+        selected_mods = {}
 
-    return LocalPack(pack_dir, pack_meta, selected_mods)
+    return LocalPack(directory=pack_dir, metadata=pack_meta, mods=selected_mods)
@@ -1,12 +1,23 @@
 from __future__ import annotations
 
+import contextlib
 import json
+import os
 import re
+import stat
+from functools import cache
 from pathlib import Path
 
 import platformdirs
 
 
+@cache
+def _key_pattern(key: str) -> re.Pattern[str]:
+    # anchored to the start of the line, so that e.g. ``InstanceDir`` doesn't match the end of
+    # some ``FooInstanceDir`` key.
+    return re.compile(rf"^{re.escape(key)}=(.*)$", re.MULTILINE)
+
+
 def get_prism_subdir(
     base_dir: Path,
     config_text: str,
@@ -22,8 +33,7 @@ def get_prism_subdir(
     :param default_name: The default name to use if unset, e.g. ``instances``.
     """
 
-    rxp = rf"{key}=(.*)$"
-    matched = re.search(rxp, config_text, re.MULTILINE)
+    matched = _key_pattern(key).search(config_text)
     dir_name = Path(default_name if matched is None else matched.group(1))
     if not dir_name.is_absolute():
         dir_name = base_dir / dir_name
@@ -59,21 +69,43 @@ def find_minecraft_dir(instances_dir: Path, instance: str):
 
 def cleanup_from_index(instance_path: Path, index_path: Path) -> None:
     """
-    Cleans up created symlinks from an index file.
+    Cleans up created symlinks and copied files from an index file.
     """
 
-    with index_path.open() as f:
-        index: list[str] = json.load(f)
-
-    for fp in index:
-        path = Path(fp)
-
-        if not path.exists(follow_symlinks=False):
+    index: list[str] | dict[str, list[str]] = json.loads(index_path.read_bytes())
+
+    # older versions only ever wrote out a plain list of symlinks.
+    if isinstance(index, list):
+        symlinks, copies = index, []
+    else:
+        symlinks, copies = index.get("symlinks", []), index.get("copies", [])
+
+    for fp in symlinks:
+        # one ``lstat`` covers both "does it exist" and "is it still a symlink". a blind ``unlink``
+        # would be one less syscall, but it'd also happily delete a real file that somebody put
+        # where one of our symlinks used to be.
+        try:
+            mode = os.lstat(fp).st_mode
+        except FileNotFoundError:
             # ok?
             continue
 
-        if not path.is_symlink():
+        if not stat.S_ISLNK(mode):
             # ok x2?
             continue
 
-        path.unlink()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(fp)
+
+    for fp in copies:
+        # these are real files, but they're ours.
+        try:
+            mode = os.lstat(fp).st_mode
+        except FileNotFoundError:
+            continue
+
+        if not stat.S_ISREG(mode):
+            continue
+
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(fp)
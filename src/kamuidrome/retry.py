@@ -1,5 +1,7 @@
 import random
 from collections.abc import Iterable, Mapping
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
 from time import sleep
 from typing import override
 
@@ -40,9 +42,32 @@ class RetryTransport(httpx.BaseTransport):  # noqa: D101
         self.jitter_ratio = jitter_ratio
         self.max_backoff_wait = max_backoff_wait
 
+    @staticmethod
+    def _parse_retry_after(value: str) -> float | None:
+        # either a number of seconds, or an http date.
+        if value.isdigit():
+            return float(value)
+
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        # no timezone means it's supposed to be GMT anyway.
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=UTC)
+
+        return (when - datetime.now(UTC)).total_seconds()
+
     def _calculate_sleep(
         self, attempts_made: int, headers: httpx.Headers | Mapping[str, str]
     ) -> float:
+        retry_after = headers.get("retry-after")
+        if self.respect_retry_after_header and retry_after:
+            hint = self._parse_retry_after(retry_after.strip())
+            if hint is not None:
+                return min(max(hint, 0.0), self.max_backoff_wait)
+
         backoff = self.backoff_factor * (2 ** (attempts_made - 1))
         jitter = (backoff * self.jitter_ratio) * random.choice([1, -1])
         total_backoff = backoff + jitter